@@ -1,9 +1,10 @@
 from NuRadioReco.modules.base.module import register_run
 import ROOT
-import random
 from NuRadioReco.utilities import units
 import numpy as np
 import logging
+import os
+import tempfile
 logger = logging.getLogger('noiseImporter')
 
 
@@ -20,38 +21,98 @@ class noiseImporter:
     if run several times.
     """
 
-    def begin(self, noise_files):
+    def __init__(self):
+        self.data = None
+        self._memmap_file = None
 
+    def begin(self, noise_files, use_memmap=False, memmap_dir=None):
+        """
+        Parameters
+        ----------
+        noise_files: list of strings
+            the ARIANNA noise files (snowshovel CalibTree format). All events of all files
+            are read in begin and kept in memory (or in a temporary file if use_memmap is True),
+            i.e., the memory consumption scales with the total number of noise events.
+        use_memmap: bool (default False)
+            if True, the noise waveforms are stored in a memory mapped temporary file
+            instead of being held in memory. Useful for noise samples larger than the
+            available RAM. The temporary file is created in memmap_dir and removed in the
+            end method.
+        memmap_dir: string or None (default None)
+            directory of the temporary file if use_memmap is True. If None, the default
+            temporary directory (usually /tmp) is used. Note that /tmp is RAM backed (tmpfs)
+            on many systems, choose a directory on disk for noise samples larger than the RAM.
+        """
+        # release the noise sample of a previous call of begin
+        self.end()
         self.nt = ROOT.TChain("CalibTree")
-        if len(noise_files) > 1:
-            logger.warning("Only using the first noise file, more is not implemented yet")
-        self.nt.Add(noise_files[0])
+        for noise_file in noise_files:
+            logger.info("adding noise file {}".format(noise_file))
+            self.nt.Add(noise_file)
 
-        self.data = ROOT.TSnCalWvData()
-        self.nt.SetBranchAddress("AmpOutData.", self.data)
+        # only the calibrated waveforms are needed, disable all other branches
+        # so that GetEntry does not decompress the header/metadata baskets
+        self.nt.SetBranchStatus("*", 0)
+        self.nt.SetBranchStatus("AmpOutData.*", 1)
+        wv = ROOT.TSnCalWvData()
+        self.nt.SetBranchAddress("AmpOutData.", wv)
+        # all entries are read sequentially, a TTreeCache fetches the baskets
+        # of the waveform branch in large blocks aligned to the basket boundaries
+        self.nt.SetCacheSize(100 * 1024 * 1024)
+        self.nt.AddBranchToCache("AmpOutData.*", True)
 
         self.nevts = self.nt.GetEntries()
+        if self.nevts == 0:
+            logger.error("no noise events found in {}".format(noise_files))
+            raise IOError("no noise events found in {}".format(noise_files))
+
+        # read the full noise sample once, so that the run method does not
+        # need to go through ROOT for every channel of every event.
+        # The calibrated waveforms stem from 12 bit ADC values, float32 is
+        # sufficient and halves the memory footprint
+        self.nt.GetEntry(0)
+        nchans = ord(wv.GetNumChans())  # convert char to int
+        nsamples = wv.GetNumSamplesOn(0)
+        if use_memmap:
+            fd, self._memmap_file = tempfile.mkstemp(suffix='.noise', dir=memmap_dir)
+            os.close(fd)
+            self.data = np.memmap(self._memmap_file, dtype=np.float32, mode='w+', shape=(self.nevts, nchans, nsamples))
+        else:
+            self.data = np.empty((self.nevts, nchans, nsamples), dtype=np.float32)
+        try:
+            for i in range(self.nevts):
+                self.nt.GetEntry(i)
+                for iCh in range(nchans):
+                    self.data[i, iCh] = wv.GetDataOnCh(iCh)
+            self.data *= units.mV
+        except Exception:
+            # do not leave the temporary file behind
+            self.end()
+            raise
+        logger.info("read {} noise events with {} channels and {} samples ({:.1f} MB)".format(
+            self.nevts, nchans, nsamples, self.data.nbytes / 1024 ** 2))
+        self._nchans = nchans
+        self._nsamples = nsamples
 
     @register_run()
     def run(self, evt, station, det):
-        # loop over stations in simulation
-        for channel in station.iter_channels():
+        # pick a noise waveform for every channel at once
+        noise_events = np.random.randint(0, self.nevts, size=station.get_number_of_channels())
+        for i_channel, channel in enumerate(station.iter_channels()):
             channel_id = channel.get_id()
-
-            # pick a noise waveform
-            noise_event = random.randint(0, self.nevts)
-            self.nt.GetEntry(noise_event)
-#                 nchans = self.data.GetNumChans()
-            noise_samples = self.data.GetNumSamplesOn(0)
+            noise_event = noise_events[i_channel]
 
             trace = channel.get_trace()
-            if (noise_samples != trace.shape[0]):
-                logger.warning("Mismatch: Noise has {0} and simulation {1} samples\n Not adding noise!".format(noise_samples, trace.shape[0]))
+            if (channel_id >= self._nchans):
+                logger.warning("Mismatch: Noise has {0} channels, no noise for simulated channel {1}\n Not adding noise!".format(self._nchans, channel_id))
+            elif (self._nsamples != trace.shape[0]):
+                logger.warning("Mismatch: Noise has {0} and simulation {1} samples\n Not adding noise!".format(self._nsamples, trace.shape[0]))
             else:
-                noise_trace = np.array(self.data.GetDataOnCh(channel_id)) * units.mV
-                noise_trace += trace
-
-                channel.set_trace(noise_trace, channel.get_sampling_rate())
+                # self.data is already in mV, no copy of the noise trace needed
+                channel.set_trace(trace + self.data[noise_event, channel_id], channel.get_sampling_rate())
 
     def end(self):
-        pass
+        if self._memmap_file is not None:
+            self.data = None
+            os.remove(self._memmap_file)
+            self._memmap_file = None
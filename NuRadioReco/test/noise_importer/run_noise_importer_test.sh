@@ -0,0 +1,4 @@
+#!/bin/bash
+
+set -e
+python3 NuRadioReco/test/noise_importer/test_noiseImporterROOT.py
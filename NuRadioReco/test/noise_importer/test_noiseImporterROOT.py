@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Tests the ARIANNA noise importer (NuRadioReco.modules.io.noise.noiseImporterROOT).
+The snowshovel ROOT classes are not available in the test environment, so ROOT is
+replaced by a minimal stub that serves the noise waveforms from numpy arrays.
+"""
+import glob
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+from numpy import testing
+from NuRadioReco.utilities import units
+import NuRadioReco.framework.event
+import NuRadioReco.framework.station
+import NuRadioReco.framework.channel
+
+# noise waveforms (in ADC units before calibration) served by the ROOT stub, keyed by file name
+noise_file_content = {}
+
+
+class TSnCalWvData:
+
+    def __init__(self):
+        self.waveforms = None
+
+    def GetNumChans(self):
+        return chr(self.waveforms.shape[0])
+
+    def GetNumSamplesOn(self, channel_id):
+        return self.waveforms.shape[1]
+
+    def GetDataOnCh(self, channel_id):
+        return self.waveforms[channel_id]
+
+
+class TChain:
+
+    def __init__(self, name):
+        self.__files = []
+        self.__wv = None
+
+    def Add(self, file_name):
+        self.__files.append(file_name)
+
+    def SetBranchStatus(self, name, status):
+        pass
+
+    def SetBranchAddress(self, name, wv):
+        self.__wv = wv
+
+    def SetCacheSize(self, size):
+        pass
+
+    def AddBranchToCache(self, name, subbranches):
+        pass
+
+    def GetEntries(self):
+        return sum([len(noise_file_content[f]) for f in self.__files])
+
+    def GetEntry(self, i):
+        for f in self.__files:
+            if i < len(noise_file_content[f]):
+                self.__wv.waveforms = noise_file_content[f][i]
+                return
+            i -= len(noise_file_content[f])
+
+
+ROOT = types.ModuleType('ROOT')
+ROOT.TChain = TChain
+ROOT.TSnCalWvData = TSnCalWvData
+sys.modules['ROOT'] = ROOT
+
+import NuRadioReco.modules.io.noise.noiseImporterROOT  # noqa: E402
+
+
+def create_noise_files(n_files=2, n_events=5, n_channels=4, n_samples=256):
+    file_names = []
+    for i_file in range(n_files):
+        file_name = 'noise_{}.root'.format(i_file)
+        noise_file_content[file_name] = np.random.normal(0, 20, (n_events, n_channels, n_samples)).astype(np.float32)
+        file_names.append(file_name)
+    return file_names
+
+
+def test_run():
+    noise_files = create_noise_files()
+    noise_data = np.concatenate([noise_file_content[f] for f in noise_files])
+    noise_importer = NuRadioReco.modules.io.noise.noiseImporterROOT.noiseImporter()
+    noise_importer.begin(noise_files)
+    testing.assert_allclose(noise_importer.data, noise_data * units.mV, rtol=1e-6)
+
+    sampling_rate = 1. * units.GHz
+    for i_event in range(100):
+        event = NuRadioReco.framework.event.Event(0, i_event)
+        station = NuRadioReco.framework.station.Station(1)
+        traces = {}
+        for channel_id in range(noise_data.shape[1]):
+            channel = NuRadioReco.framework.channel.Channel(channel_id)
+            traces[channel_id] = np.random.normal(0, 1, noise_data.shape[2]) * units.mV
+            channel.set_trace(traces[channel_id], sampling_rate)
+            station.add_channel(channel)
+        np.random.seed(i_event)
+        noise_importer.run(event, station, None)
+        np.random.seed(i_event)
+        noise_events = np.random.randint(0, noise_importer.nevts, size=station.get_number_of_channels())
+        assert np.all((noise_events >= 0) & (noise_events < len(noise_data)))
+        for channel in station.iter_channels():
+            channel_id = channel.get_id()
+            trace = channel.get_trace()
+            # the float32 noise is promoted to the float64 precision of the simulated trace
+            assert trace.dtype == np.float64
+            testing.assert_equal(trace, traces[channel_id] + noise_importer.data[noise_events[channel_id], channel_id])
+
+    # channels without a counterpart in the noise data are left untouched
+    event = NuRadioReco.framework.event.Event(0, 0)
+    station = NuRadioReco.framework.station.Station(1)
+    channel = NuRadioReco.framework.channel.Channel(noise_data.shape[1])
+    trace = np.random.normal(0, 1, noise_data.shape[2]) * units.mV
+    channel.set_trace(trace, sampling_rate)
+    station.add_channel(channel)
+    noise_importer.run(event, station, None)
+    testing.assert_equal(channel.get_trace(), trace)
+    noise_importer.end()
+
+
+def test_memmap():
+    noise_files = create_noise_files()
+    noise_data = np.concatenate([noise_file_content[f] for f in noise_files])
+    noise_importer = NuRadioReco.modules.io.noise.noiseImporterROOT.noiseImporter()
+    # calling end without begin must not fail
+    noise_importer.end()
+
+    noise_importer.begin(noise_files, use_memmap=True)
+    memmap_file = noise_importer._memmap_file
+    assert isinstance(noise_importer.data, np.memmap)
+    assert os.path.exists(memmap_file)
+    testing.assert_allclose(noise_importer.data, noise_data * units.mV, rtol=1e-6)
+
+    # a second begin releases the temporary file of the first one
+    noise_importer.begin(noise_files, use_memmap=True)
+    assert not os.path.exists(memmap_file)
+    memmap_file = noise_importer._memmap_file
+    assert os.path.exists(memmap_file)
+
+    noise_importer.end()
+    assert noise_importer.data is None
+    assert not os.path.exists(memmap_file)
+
+    # the temporary file is created in the requested directory
+    memmap_dir = tempfile.mkdtemp()
+    noise_importer.begin(noise_files, use_memmap=True, memmap_dir=memmap_dir)
+    assert os.path.dirname(noise_importer._memmap_file) == memmap_dir
+    noise_importer.end()
+    assert os.listdir(memmap_dir) == []
+    os.rmdir(memmap_dir)
+
+    # the temporary file is removed if reading the noise sample fails
+    noise_file_content['broken.root'] = noise_file_content[noise_files[0]][:, :, :-1]
+    temporary_files = set(glob.glob(os.path.join(tempfile.gettempdir(), '*.noise')))
+    try:
+        noise_importer.begin(noise_files + ['broken.root'], use_memmap=True)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("reading noise waveforms of inconsistent length did not fail")
+    assert noise_importer._memmap_file is None
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), '*.noise'))) == temporary_files
+
+
+if __name__ == "__main__":
+    test_run()
+    test_memmap()
+    print("noise importer tests passed")
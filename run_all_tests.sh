@@ -11,4 +11,5 @@ NuRadioMC/test/atmospheric_Aeff/1e18eV/test_build.sh
 NuRadioMC/test/examples/test_examples.sh
 NuRadioReco/test/tiny_reconstruction/testTinyReconstruction.sh
 NuRadioReco/test/trigger_tests/run_trigger_test.sh
+NuRadioReco/test/noise_importer/run_noise_importer_test.sh
 NuRadioReco/test/test_examples.sh
\ No newline at end of file